@@ -11,6 +11,7 @@ On subsequent runs: loads the session ID and resumes the conversation.
 To start fresh: delete the .tarini_session file.
 """
 import asyncio
+import sys
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -29,7 +30,7 @@ SESSION_FILE = Path(".tarini_session")
 async def load_or_create_session() -> dict:
     """Load session from file, or create a new one and save the ID."""
     if SESSION_FILE.exists():
-        session_id = SESSION_FILE.read_text().strip()
+        session_id = (await asyncio.to_thread(SESSION_FILE.read_text)).strip()
         session = await db.get_session(session_id)
         if session:
             print(f"[Resuming session: {session_id[:8]}...]")
@@ -38,14 +39,20 @@ async def load_or_create_session() -> dict:
             print("[Session not found in database — starting fresh]")
 
     session = await db.create_session()
-    SESSION_FILE.write_text(session["id"])
+    await asyncio.to_thread(SESSION_FILE.write_text, session["id"])
     print(f"[New session: {session['id'][:8]}...]")
     return session
 
 
 def print_tarini(text: str) -> None:
-    """Print Tarini's response with a label."""
-    print(f"\nTarini: {text}", end="", flush=True)
+    """Write a chunk of Tarini's response, flushing only on newline boundaries.
+
+    Forcing a TTY flush per streamed delta costs a write syscall per token;
+    stdout's own buffering batches the chunks and run_turn does a final flush.
+    """
+    sys.stdout.write(text)
+    if "\n" in text:
+        sys.stdout.flush()
 
 
 async def run_turn(
@@ -66,14 +73,15 @@ async def run_turn(
             for block in msg.content:
                 if isinstance(block, TextBlock) and block.text:
                     if not printed:
-                        print()  # newline before first chunk
+                        sys.stdout.write("\nTarini: ")
                         printed = True
                     print_tarini(block.text)
         elif isinstance(msg, ResultMessage):
             captured_sdk_id = msg.session_id
 
     if printed:
-        print()  # trailing newline
+        sys.stdout.write("\n")
+    sys.stdout.flush()
 
     return captured_sdk_id
 
@@ -93,8 +101,13 @@ async def main() -> None:
     async with ClaudeSDKClient(options=options) as client:
         # Opening — Tarini checks state and greets
         sdk_id = await run_turn(client, INITIAL_PROMPT, session)
+        persist_task: asyncio.Task | None = None
         if sdk_id and not sdk_session_id:
-            await db.update_sdk_session_id(session_id, sdk_id)
+            # Write-behind: persist the SDK id without stalling the first
+            # response; awaited before exit so the write always lands.
+            persist_task = asyncio.create_task(
+                db.update_sdk_session_id(session_id, sdk_id)
+            )
             sdk_session_id = sdk_id
 
         # Chat loop
@@ -124,6 +137,9 @@ async def main() -> None:
 
             await run_turn(client, user_input, session)
 
+        if persist_task is not None:
+            await persist_task
+
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -14,18 +14,23 @@ SSE event format:
   data: {"type": "error", "message": "..."}
 """
 import asyncio
-import json
 import logging
+import sys
 from contextlib import asynccontextmanager
 
+import anthropic
+import orjson
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
 load_dotenv()
 
+from tarini import agent
+from tarini.db import cache as db_cache
 from tarini.db import client as db
 from tarini.prompts import INITIAL_PROMPT
 from tarini.session_manager import session_manager
@@ -42,10 +47,10 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     logger.info("Tarini server starting up")
     await db.init_client()
-    session_manager.start_eviction_task()
     yield
     logger.info("Tarini server shutting down")
     await session_manager.cleanup()
+    await agent.close_client()
     await db.close_client()
 
 
@@ -53,7 +58,31 @@ async def lifespan(app: FastAPI):
 # App
 # ---------------------------------------------------------------------------
 
-app = FastAPI(title="Tarini API", version="2.0.0", lifespan=lifespan)
+app = FastAPI(
+    title="Tarini API",
+    version="2.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
+
+class _GZipExceptSSE:
+    """Gzip JSON responses but never the SSE chat stream.
+
+    Compressing text/event-stream breaks incremental flushing. Starlette only
+    skips it by content type in recent versions, so route around the gzip
+    middleware by path instead — the /chat suffix is the sole SSE endpoint.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=1024)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].endswith("/chat"):
+            await self.app(scope, receive, send)
+        else:
+            await self.gzip(scope, receive, send)
+
 
 app.add_middleware(
     CORSMiddleware,
@@ -63,6 +92,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(_GZipExceptSSE)
+
 
 # ---------------------------------------------------------------------------
 # Request models
@@ -76,6 +107,32 @@ class ChatRequest(BaseModel):
 # SSE keepalive helper
 # ---------------------------------------------------------------------------
 
+# Pre-encoded frames for the constant events — Starlette forwards bytes
+# untouched, so no JSON encode or UTF-8 encode per keepalive tick.
+_THINKING_FRAME = b'data: {"type": "thinking"}\n\n'
+_DONE_FRAME = b'data: {"type": "done"}\n\n'
+_ERROR_GENERIC_FRAME = (
+    b'data: {"type": "error", "message": "An error occurred. Please try again."}\n\n'
+)
+_ERROR_BUSY_FRAME = (
+    b'data: {"type": "error", "message": '
+    b'"Tarini is a bit busy right now \xe2\x80\x94 please try again in a few seconds."}\n\n'
+)
+
+# Text coalescing — Claude streams many tiny deltas; each frame costs a JSON
+# encode and a send syscall, so batch deltas that arrive close together.
+_TEXT_BATCH_WINDOW = 0.025  # seconds
+_TEXT_BATCH_MAX_CHARS = 4096
+
+_DATA_PREFIX = b"data: "
+_FRAME_END = b"\n\n"
+
+
+def _sse_frame(event: dict) -> bytes:
+    """Encode one SSE frame in a single join — no intermediate str concats."""
+    return b"".join((_DATA_PREFIX, orjson.dumps(event), _FRAME_END))
+
+
 async def _stream_with_keepalives(
     session_id: str,
     user_message: str,
@@ -84,59 +141,105 @@ async def _stream_with_keepalives(
     """
     Async generator that streams chat events with keepalives.
 
-    Uses asyncio.Queue bridge so the chat logic runs in a background task
-    while keepalives are sent during quiet periods (tool execution, API calls).
-    """
-    yield f"data: {json.dumps({'type': 'thinking'})}\n\n"
-
-    queue: asyncio.Queue[dict | None] = asyncio.Queue()
-
-    async def _run_chat() -> None:
-        try:
-            async with session_manager.query_lock(session_id):
-                async for event in session_manager.chat(session_id, user_message):
-                    await queue.put(event)
-        except Exception:
-            logger.exception("[_run_chat] ERROR for session %s", session_id)
-            session_manager.remove_session(session_id)
-            await queue.put({"type": "error", "message": "An error occurred. Please try again."})
-        finally:
-            await queue.put(None)  # sentinel
-
-    task = asyncio.create_task(_run_chat())
-
-    # Drain queue with keepalives using asyncio.wait (not wait_for)
-    get_task: asyncio.Task = asyncio.ensure_future(queue.get())
-    try:
-        while True:
-            done, _ = await asyncio.wait({get_task}, timeout=keepalive_interval)
-
-            if not done:
-                yield f"data: {json.dumps({'type': 'thinking'})}\n\n"
-                continue
+    Iterates session_manager.chat directly — no queue bridge, sentinel, or
+    background producer task. Each event is awaited with a timeout so a
+    "thinking" keepalive goes out during quiet periods (tool execution, API
+    calls). The anext() call runs in a shielded task so a keepalive timeout
+    never cancels the underlying generator mid-await.
 
-            item = get_task.result()
-            if item is None:
-                break
+    Consecutive text events are coalesced into one frame: deltas are buffered
+    until _TEXT_BATCH_WINDOW elapses or _TEXT_BATCH_MAX_CHARS accumulate,
+    whichever comes first. Any non-text event flushes the buffer ahead of
+    itself so ordering is preserved.
+    """
+    yield _THINKING_FRAME
 
-            yield f"data: {json.dumps(item, ensure_ascii=False)}\n\n"
+    loop = asyncio.get_running_loop()
+    events = session_manager.chat(session_id, user_message)
+    next_event: asyncio.Task | None = None
 
-            if item.get("type") in ("done", "error"):
-                break
+    # Pending text deltas awaiting a flush
+    text_buf: list[str] = []
+    text_len = 0
+    flush_at = 0.0
 
-            get_task = asyncio.ensure_future(queue.get())
+    try:
+        async with session_manager.query_lock(session_id):
+            next_event = asyncio.ensure_future(anext(events))
+            while True:
+                if text_buf:
+                    timeout = min(keepalive_interval, max(flush_at - loop.time(), 0.0))
+                else:
+                    timeout = keepalive_interval
+
+                try:
+                    item = await asyncio.wait_for(
+                        asyncio.shield(next_event), timeout=timeout,
+                    )
+                except TimeoutError:
+                    if text_buf:
+                        yield _sse_frame({"type": "text", "text": "".join(text_buf)})
+                        text_buf.clear()
+                        text_len = 0
+                    else:
+                        yield _THINKING_FRAME
+                    continue
+                except StopAsyncIteration:
+                    break
+
+                if item.get("type") == "text":
+                    if not text_buf:
+                        flush_at = loop.time() + _TEXT_BATCH_WINDOW
+                    text_buf.append(item["text"])
+                    text_len += len(item["text"])
+                    if text_len >= _TEXT_BATCH_MAX_CHARS:
+                        yield _sse_frame({"type": "text", "text": "".join(text_buf)})
+                        text_buf.clear()
+                        text_len = 0
+                    next_event = asyncio.ensure_future(anext(events))
+                    continue
+
+                # Non-text event — flush buffered text first to keep ordering
+                if text_buf:
+                    yield _sse_frame({"type": "text", "text": "".join(text_buf)})
+                    text_buf.clear()
+                    text_len = 0
+
+                if item.get("type") == "done":
+                    yield _DONE_FRAME
+                    break
+
+                yield _sse_frame(item)
+
+                if item.get("type") == "error":
+                    break
+
+                next_event = asyncio.ensure_future(anext(events))
+    # asyncio.CancelledError (client disconnect / shutdown) is a BaseException
+    # and deliberately not caught here — it must propagate.
+    #
+    # All error paths call remove_session: in this architecture that is a cheap
+    # rollback of the in-memory history to the last persisted turn, not an
+    # expensive client teardown — a half-appended turn (dangling user message
+    # or tool_use without its result) would poison the next API call.
+    except (anthropic.RateLimitError, anthropic.APIConnectionError) as e:
+        # Transient upstream conditions: warn without a stack trace, and give
+        # the user a retry-flavoured message rather than a generic failure.
+        logger.warning("[chat] transient upstream error for session %s: %s", session_id, e)
+        session_manager.remove_session(session_id)
+        yield _ERROR_BUSY_FRAME
+    except Exception:
+        logger.exception("[chat] ERROR for session %s", session_id)
+        session_manager.remove_session(session_id)
+        yield _ERROR_GENERIC_FRAME
     finally:
-        if not get_task.done():
-            get_task.cancel()
+        if next_event is not None and not next_event.done():
+            next_event.cancel()
             try:
-                await get_task
+                await next_event
             except (asyncio.CancelledError, Exception):
                 pass
-        task.cancel()
-        try:
-            await task
-        except (asyncio.CancelledError, Exception):
-            pass
+        await events.aclose()
 
 
 # ---------------------------------------------------------------------------
@@ -151,7 +254,7 @@ async def create_session():
 
 @app.get("/sessions/{session_id}")
 async def get_session(session_id: str):
-    session = await db.get_session(session_id)
+    session = await db_cache.get_session_cached(session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     return {
@@ -166,7 +269,11 @@ async def get_session(session_id: str):
 
 @app.post("/sessions/{session_id}/chat")
 async def chat(session_id: str, body: ChatRequest):
-    session = await db.get_session(session_id)
+    # Interned once at the boundary: the id keys half a dozen dict lookups
+    # per turn downstream (cache, admission counter, session records), and
+    # interning lets those hash/compare on pointer identity.
+    session_id = sys.intern(session_id)
+    session = await db_cache.get_session_cached(session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
@@ -10,13 +10,16 @@ It yields SSE-ready dicts including:
   - {"type": "state_snapshot", ...}        — full state update for frontend
   - {"type": "done"}                       — stream end
 """
+import asyncio
 import json
 import logging
 import os
 from typing import AsyncIterator
 
 import anthropic
+import httpx
 
+from tarini.db import cache as db_cache
 from tarini.prompts import load_system_prompt
 from tarini.tools import TOOL_DEFINITIONS, execute_tool
 from tarini.tools.ui import validate_emit_ui
@@ -26,22 +29,154 @@ logger = logging.getLogger(__name__)
 MODEL = "claude-sonnet-4-20250514"
 MAX_TOOL_ROUNDS = 10  # safety limit to prevent infinite tool loops
 _MAX_API_HISTORY = 20  # ~5 tool-use turns of context for the API call
+# Per-round transport timeout. The SDK default allows 10 minutes of total
+# silence; healthy streams deliver deltas every few hundred ms, so 30s with
+# no bytes means the upstream stalled. The resulting APITimeoutError
+# surfaces through the SSE layer's generic error handling (error frame +
+# history rollback), and closing the stream frees the socket.
+_ROUND_TIMEOUT = httpx.Timeout(connect=5.0, read=30.0, write=30.0, pool=10.0)
+
+
+# ---------------------------------------------------------------------------
+# Shared Anthropic client — one httpx pool for the whole process
+# ---------------------------------------------------------------------------
+
+_client: anthropic.AsyncAnthropic | None = None
+
+
+def _get_client() -> anthropic.AsyncAnthropic:
+    """Return the shared AsyncAnthropic client, creating it on first use.
+
+    A per-call client would open a fresh TCP+TLS connection to
+    api.anthropic.com on every turn; the singleton keeps the pool warm.
+    """
+    global _client
+    if _client is None:
+        _client = anthropic.AsyncAnthropic(api_key=os.environ["ANTHROPIC_API_KEY"])
+    return _client
+
+
+async def close_client() -> None:
+    """Close the shared client — called on server shutdown."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+# ---------------------------------------------------------------------------
+# Stage metadata — shared by the StageTransitionCard emission
+# ---------------------------------------------------------------------------
+
+_STAGES = ("intro", "structure", "packages", "mapping", "verification")
+_PREV_STAGE = {stage: _STAGES[max(0, i - 1)] for i, stage in enumerate(_STAGES)}
+
+_STAGE_LABELS = {
+    "intro": "Introduction",
+    "structure": "Property Structure",
+    "packages": "Rental Packages",
+    "mapping": "Room Mapping",
+    "verification": "Verification",
+}
+
+_STAGE_DESCRIPTIONS = {
+    "structure": "Define your floors, rooms, and naming convention",
+    "packages": "Set up your rental packages with pricing",
+    "mapping": "Assign packages to your rooms",
+    "verification": "Review and confirm everything",
+}
+
+
+# Tool schemas with a cache breakpoint on the final tool: together with the
+# breakpoint on the system block, the whole tools+system prefix is served from
+# Anthropic's prompt cache on rounds 2…N of the tool loop.
+_CACHED_TOOLS = tuple(
+    {**tool, "cache_control": {"type": "ephemeral"}}
+    if i == len(TOOL_DEFINITIONS) - 1
+    else tool
+    for i, tool in enumerate(TOOL_DEFINITIONS)
+)
 
 
 # ---------------------------------------------------------------------------
 # Sliding window — keeps API costs bounded
 # ---------------------------------------------------------------------------
 
-def _trim_history_for_api(history: list[dict]) -> list[dict]:
-    """Return a trimmed copy of history for the API call.
+def _find_turn_boundary(history: list[dict], target: int) -> int:
+    """Index of the first real user turn at or after len(history) - target.
+
+    A real user turn has plain-string content; cutting anywhere else could
+    strand a tool_result whose tool_use was truncated away, which the API
+    rejects. Falls back to the raw window start if no boundary is found.
+    """
+    start = max(0, len(history) - target)
+    for i in range(start, len(history)):
+        msg = history[i]
+        if msg.get("role") == "user" and isinstance(msg.get("content"), str):
+            return i
+    return start
+
+
+async def _trim_history_for_api(session_id: str, history: list[dict]) -> list[dict]:
+    """Return a trimmed view of history for the API call.
 
     The full history stays intact in SessionManager for Supabase persistence.
-    get_state provides all captured property data, so old conversation turns
-    are redundant — the state IS the memory.
+    Instead of dropping old turns outright, the truncated prefix is replaced
+    by a compact summary of the saved property state folded into the first
+    kept user turn — the state IS the memory, and this tells the model to
+    trust it rather than re-ask. The state read is served by the db TTL cache
+    (invalidated on every state write), so no summary staleness and no extra
+    round-trip in the steady state.
     """
     if len(history) <= _MAX_API_HISTORY:
         return history
-    return history[-_MAX_API_HISTORY:]
+
+    boundary = _find_turn_boundary(history, _MAX_API_HISTORY)
+
+    session = await db_cache.get_session_cached(session_id)
+    state = (session or {}).get("state") or {}
+    stage = (session or {}).get("stage", "intro")
+    summary = (
+        "[Earlier conversation truncated. "
+        f"Current stage: {stage}. Saved property state: "
+        f"{json.dumps(state, ensure_ascii=False)}. "
+        "Trust this state — do not re-ask for information it already holds.]"
+    )
+
+    boundary_msg = history[boundary]
+    if isinstance(boundary_msg.get("content"), str):
+        # Fold the summary into the first kept user turn so roles still
+        # alternate; the original history message is never mutated.
+        merged = {
+            "role": "user",
+            "content": f"{summary}\n\n{boundary_msg['content']}",
+        }
+        return [merged, *history[boundary + 1:]]
+    return history[boundary:]
+
+
+def _mark_history_cache_boundary(api_history: list[dict]) -> list[dict]:
+    """Return a copy with an ephemeral cache breakpoint on the last message.
+
+    Marking the final content block means the conversation prefix built up
+    across tool rounds is cached incrementally instead of re-prefilled from
+    scratch every round — O(N) prefill for the loop instead of O(N²). Only
+    the touched message is copied; the original history list stays unmodified
+    for Supabase persistence.
+    """
+    if not api_history:
+        return api_history
+
+    last = api_history[-1]
+    content = last.get("content")
+    if not isinstance(content, list) or not content:
+        # Plain-string user message — the system/tools breakpoints still cover
+        # the static prefix, nothing to mark here.
+        return api_history
+
+    marked_block = {**content[-1], "cache_control": {"type": "ephemeral"}}
+    marked_last = {**last, "content": content[:-1] + [marked_block]}
+    return api_history[:-1] + [marked_last]
 
 
 # ---------------------------------------------------------------------------
@@ -83,15 +218,24 @@ async def stream_chat(
         SSE event dicts with various types (text, tool_start, tool_complete,
         component, state_snapshot, done, etc.)
     """
-    client = anthropic.AsyncAnthropic(api_key=os.environ["ANTHROPIC_API_KEY"])
-    system_prompt = load_system_prompt()
+    client = _get_client()
+    system_blocks = [
+        {
+            "type": "text",
+            "text": load_system_prompt(),
+            "cache_control": {"type": "ephemeral"},
+        }
+    ]
 
     # Add the user message to history
     history.append({"role": "user", "content": user_message})
 
     for _round in range(MAX_TOOL_ROUNDS):
-        # Trim history for the API call (full history stays intact for persistence)
-        api_history = _trim_history_for_api(history)
+        # Trim history for the API call (full history stays intact for
+        # persistence) and mark the prefix boundary for incremental caching
+        api_history = _mark_history_cache_boundary(
+            await _trim_history_for_api(session_id, history)
+        )
 
         logger.info(
             "[stream_chat] round %d for session %s (%d messages, %d sent to API)",
@@ -100,15 +244,14 @@ async def stream_chat(
 
         # Stream the API response
         collected_text = ""
-        tool_use_blocks = []
 
         async with client.messages.stream(
             model=MODEL,
             max_tokens=4096,
-            system=system_prompt,
+            system=system_blocks,
             messages=api_history,
-            tools=TOOL_DEFINITIONS,
-            cache_control={"type": "ephemeral"},
+            tools=_CACHED_TOOLS,
+            timeout=_ROUND_TIMEOUT,
         ) as stream:
             async for event in stream:
                 if event.type == "content_block_delta":
@@ -123,30 +266,39 @@ async def stream_chat(
         # Log token usage for cost tracking
         _log_usage(session_id, _round, final_message)
 
-        # Record the assistant's full response in history (serialised to plain dicts
-        # so the history is JSON-storable in Supabase)
+        # No tool use — the common case. The streamed text already holds the
+        # full response, so record it directly and skip the content scan.
+        if final_message.stop_reason != "tool_use":
+            history.append({
+                "role": "assistant",
+                "content": (
+                    [{"type": "text", "text": collected_text}]
+                    if collected_text
+                    else _split_content(final_message.content)[0]
+                ),
+            })
+            yield {"type": "done"}
+            return
+
+        # Record the assistant's full response in history (serialised to plain
+        # dicts so the history is JSON-storable in Supabase) and collect any
+        # tool_use blocks in the same pass
+        serialized_content, tool_use_blocks = _split_content(final_message.content)
         history.append({
             "role": "assistant",
-            "content": _serialize_content(final_message.content),
+            "content": serialized_content,
         })
 
-        # Check if the model wants to use tools
-        tool_use_blocks = [
-            block for block in final_message.content
-            if block.type == "tool_use"
-        ]
-
-        if final_message.stop_reason != "tool_use" or not tool_use_blocks:
-            # No tool use — we're done
+        if not tool_use_blocks:
             yield {"type": "done"}
             return
 
-        # Execute all tool calls and build tool results
+        # Execute all tool calls and build tool results.
         tool_results = []
-        for tool_block in tool_use_blocks:
-            tool_id = f"tool_{tool_block.id}"
 
-            # ── emit_ui is special — it emits a component event, not a tool indicator ──
+        # ── Phase 1: emit the pre-execution events for every call up front ──
+        for tool_block in tool_use_blocks:
+            # emit_ui is special — it emits a component event, not a tool indicator
             if tool_block.name == "emit_ui":
                 component = tool_block.input.get("component", "")
                 props = tool_block.input.get("props", {})
@@ -160,45 +312,76 @@ async def stream_chat(
                         "props": props,
                         "id": f"comp_{tool_block.id}",
                     }
-
-                # Execute the tool (returns confirmation or error to Claude)
-                result_str = await execute_tool(
-                    session_id, tool_block.name, tool_block.input,
-                )
-                tool_results.append({
-                    "type": "tool_result",
-                    "tool_use_id": tool_block.id,
-                    "content": result_str,
-                })
                 continue
 
-            # ── Normal tools: emit tool_start → execute → emit tool_complete ──
-
-            description = _tool_description(tool_block.name, tool_block.input)
-
             logger.info(
                 "[stream_chat] executing tool %s for session %s",
                 tool_block.name, session_id,
             )
-
-            # Emit tool_start
             yield {
                 "type": "tool_start",
                 "tool": tool_block.name,
-                "description": description,
-                "id": tool_id,
+                "description": _tool_description(tool_block.name, tool_block.input),
+                "id": f"tool_{tool_block.id}",
             }
 
-            # Execute the tool
-            result_str = await execute_tool(
-                session_id, tool_block.name, tool_block.input,
+        # ── Phase 2: run the tools ──
+        # The common multi-tool turn (one state tool + emit_ui calls) is
+        # independent, so execute concurrently and pay only the slowest call.
+        # Two state-mutating tools in one turn run in order instead, because
+        # update_state's read-merge-write must see the earlier write.
+        mutating = sum(
+            1 for b in tool_use_blocks
+            if b.name in ("update_state", "advance_stage")
+        )
+        if mutating > 1:
+            results: list = []
+            for tool_block in tool_use_blocks:
+                try:
+                    results.append(await execute_tool(
+                        session_id, tool_block.name, tool_block.input,
+                    ))
+                except Exception as exc:
+                    results.append(exc)
+        else:
+            results = await asyncio.gather(
+                *(
+                    execute_tool(session_id, b.name, b.input)
+                    for b in tool_use_blocks
+                ),
+                return_exceptions=True,
             )
 
-            # Parse result for structured events
-            try:
-                result_data = json.loads(result_str)
-            except (json.JSONDecodeError, TypeError):
-                result_data = {}
+        # ── Phase 3: emit completions and tool_results in original order ──
+        for tool_block, result in zip(tool_use_blocks, results):
+            tool_id = f"tool_{tool_block.id}"
+
+            if isinstance(result, BaseException):
+                # Feed the failure back to Claude instead of killing the
+                # stream — it can retry or explain.
+                logger.error(
+                    "[stream_chat] tool %s failed for session %s",
+                    tool_block.name, session_id, exc_info=result,
+                )
+                tool_results.append({
+                    "type": "tool_result",
+                    "tool_use_id": tool_block.id,
+                    "content": str(result),
+                    "is_error": True,
+                })
+                continue
+
+            result_str, result_data = result
+
+            if tool_block.name == "emit_ui":
+                # Component event already went out in phase 1; just return
+                # the confirmation (or validation error) to Claude.
+                tool_results.append({
+                    "type": "tool_result",
+                    "tool_use_id": tool_block.id,
+                    "content": result_str,
+                })
+                continue
 
             # Emit tool_complete
             yield {
@@ -210,65 +393,39 @@ async def stream_chat(
 
             # ── Auto-emit events based on tool results ──
 
-            # After update_state: emit state_snapshot so frontend stays in sync
+            # After update_state: emit state_snapshot so frontend stays in sync.
+            # The tool result carries state, version and stage — no DB re-fetch.
             if tool_block.name == "update_state" and result_data.get("saved"):
-                state = result_data.get("state", {})
-                version = result_data.get("state_version", 0)
-                # We need the current stage — get it from the session
-                from tarini.db import client as db
-                session = await db.get_session(session_id)
-                stage = session.get("stage", "intro") if session else "intro"
-
                 yield {
                     "type": "state_snapshot",
-                    "state": state,
-                    "stage": stage,
-                    "stateVersion": version,
+                    "state": result_data.get("state", {}),
+                    "stage": result_data.get("stage", "intro"),
+                    "stateVersion": result_data.get("state_version", 0),
                 }
 
 
-            # After advance_stage: emit state_snapshot with new stage
+            # After advance_stage: emit state_snapshot with the new stage —
+            # state and version ride along in the tool result, no DB re-fetch
             if tool_block.name == "advance_stage" and result_data.get("advanced"):
                 new_stage = result_data.get("stage", "")
-                # Get full state for the snapshot
-                from tarini.db import client as db
-                session = await db.get_session(session_id)
-                state = session.get("state", {}) if session else {}
-                version = session.get("state_version", 0) if session else 0
 
                 yield {
                     "type": "state_snapshot",
-                    "state": state,
+                    "state": result_data.get("state", {}),
                     "stage": new_stage,
-                    "stateVersion": version,
-                }
-
-                # Determine stage descriptions for the transition card
-                stage_labels = {
-                    "intro": "Introduction",
-                    "structure": "Property Structure",
-                    "packages": "Rental Packages",
-                    "mapping": "Room Mapping",
-                    "verification": "Verification",
-                }
-                stage_descriptions = {
-                    "structure": "Define your floors, rooms, and naming convention",
-                    "packages": "Set up your rental packages with pricing",
-                    "mapping": "Assign packages to your rooms",
-                    "verification": "Review and confirm everything",
+                    "stateVersion": result_data.get("state_version", 0),
                 }
 
+                previous_stage = _PREV_STAGE.get(new_stage, "intro")
                 yield {
                     "type": "component",
                     "name": "StageTransitionCard",
                     "props": {
-                        "completedStage": _get_previous_stage(new_stage),
-                        "completedStageLabel": stage_labels.get(
-                            _get_previous_stage(new_stage), ""
-                        ),
+                        "completedStage": previous_stage,
+                        "completedStageLabel": _STAGE_LABELS.get(previous_stage, ""),
                         "nextStage": new_stage,
-                        "nextStageLabel": stage_labels.get(new_stage, ""),
-                        "nextStageDescription": stage_descriptions.get(
+                        "nextStageLabel": _STAGE_LABELS.get(new_stage, ""),
+                        "nextStageDescription": _STAGE_DESCRIPTIONS.get(
                             new_stage, ""
                         ),
                     },
@@ -293,43 +450,45 @@ async def stream_chat(
 # Helpers
 # ---------------------------------------------------------------------------
 
-def _get_previous_stage(current_stage: str) -> str:
-    """Return the stage before the given stage."""
-    stages = ["intro", "structure", "packages", "mapping", "verification"]
-    idx = stages.index(current_stage) if current_stage in stages else 0
-    return stages[max(0, idx - 1)]
-
-
 def _log_usage(session_id: str, round_num: int, message) -> None:
     """Log token usage from the API response for cost tracking."""
+    if not logger.isEnabledFor(logging.INFO):
+        return
     try:
         usage = message.usage
-        cache_read = getattr(usage, "cache_read_input_tokens", 0)
-        cache_write = getattr(usage, "cache_creation_input_tokens", 0)
         logger.info(
             "[stream_chat] tokens session=%s round=%d | "
             "input=%d cache_read=%d cache_write=%d output=%d",
             session_id, round_num,
             usage.input_tokens,
-            cache_read,
-            cache_write,
+            # Always present on the pinned SDK's Usage model, but None when
+            # the request had no cache breakpoints.
+            usage.cache_read_input_tokens or 0,
+            usage.cache_creation_input_tokens or 0,
             usage.output_tokens,
         )
     except Exception:
         logger.debug("[stream_chat] could not read usage for session %s", session_id)
 
 
-def _serialize_content(content) -> list[dict]:
-    """Convert Anthropic SDK content blocks to plain JSON-serialisable dicts."""
-    out: list[dict] = []
+def _split_content(content) -> tuple[list[dict], list]:
+    """Serialise SDK content blocks to plain dicts and collect tool_use blocks.
+
+    One walk over the content builds both the JSON-storable history entry and
+    the list of tool_use blocks to execute, instead of a serialise pass plus a
+    filter pass.
+    """
+    serialized: list[dict] = []
+    tool_use_blocks: list = []
     for block in content:
         if block.type == "text":
-            out.append({"type": "text", "text": block.text})
+            serialized.append({"type": "text", "text": block.text})
         elif block.type == "tool_use":
-            out.append({
+            serialized.append({
                 "type": "tool_use",
                 "id": block.id,
                 "name": block.name,
                 "input": block.input,
             })
-    return out
+            tool_use_blocks.append(block)
+    return serialized, tool_use_blocks
@@ -0,0 +1,58 @@
+"""
+In-process TTL cache in front of db.get_session.
+
+The frontend polls GET /sessions/{id} and every chat turn re-reads the same
+row, so a short-lived (seconds) cache turns most of those Supabase round-trips
+into a dict lookup. Entries are invalidated by the db layer on any state
+write, so staleness is bounded by the TTL for reads that race a write from
+another process only.
+"""
+import asyncio
+import logging
+import time
+import weakref
+
+from tarini.db import client as db
+
+logger = logging.getLogger(__name__)
+
+_TTL_SECONDS = 3.0
+
+# session_id → (monotonic timestamp, session row)
+_cache: dict[str, tuple[float, dict]] = {}
+# Per-key locks so concurrent misses coalesce into a single DB fetch. Weak
+# values: a lock lives only while some miss holds it (the `async with` below
+# keeps a strong reference), so idle sessions don't accumulate Lock objects.
+_miss_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+async def get_session_cached(session_id: str, ttl: float = _TTL_SECONDS) -> dict | None:
+    """Return the session row, serving from the TTL cache when fresh."""
+    entry = _cache.get(session_id)
+    if entry and (time.monotonic() - entry[0]) < ttl:
+        return entry[1]
+
+    # get-then-insert rather than setdefault: setdefault constructs (and
+    # usually discards) a Lock on every miss-path call. Race-free on the
+    # single event loop — there is no await between the get and the insert.
+    lock = _miss_locks.get(session_id)
+    if lock is None:
+        lock = _miss_locks[session_id] = asyncio.Lock()
+    async with lock:
+        # Re-check under the lock — a concurrent miss may have refilled it
+        entry = _cache.get(session_id)
+        if entry and (time.monotonic() - entry[0]) < ttl:
+            return entry[1]
+
+        session = await db.get_session(session_id)
+        if session is not None:
+            _cache[session_id] = (time.monotonic(), session)
+        return session
+
+
+def invalidate(session_id: str) -> None:
+    """Drop the cached row for a session — called after any state write."""
+    _cache.pop(session_id, None)
+    _miss_locks.pop(session_id, None)
@@ -25,10 +25,11 @@ _mem_sessions: dict[str, dict] = {}
 # ---------------------------------------------------------------------------
 
 _client = None
+_http = None
 
 
 async def init_client() -> None:
-    global _client, _USE_MEMORY
+    global _client, _http, _USE_MEMORY
     url = os.environ.get("SUPABASE_URL")
     key = os.environ.get("SUPABASE_SERVICE_KEY")
 
@@ -38,8 +39,20 @@ async def init_client() -> None:
         return
 
     try:
-        from supabase import acreate_client
-        _client = await asyncio.wait_for(acreate_client(url, key), timeout=5.0)
+        import httpx
+        from supabase import AsyncClientOptions, acreate_client
+
+        # One pooled HTTP/2 connection shared by every Supabase call — avoids
+        # per-request DNS + TLS setup and multiplexes concurrent queries.
+        _http = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            timeout=10.0,
+        )
+        _client = await asyncio.wait_for(
+            acreate_client(url, key, options=AsyncClientOptions(httpx_client=_http)),
+            timeout=5.0,
+        )
         # Quick connectivity check
         await asyncio.wait_for(
             _client.table("sessions").select("id").limit(1).execute(),
@@ -49,12 +62,18 @@ async def init_client() -> None:
     except Exception as e:
         logger.warning("Supabase unreachable (%s) — falling back to in-memory store", e)
         _client = None
+        if _http is not None:
+            await _http.aclose()
+            _http = None
         _USE_MEMORY = True
 
 
 async def close_client() -> None:
-    global _client
+    global _client, _http
     _client = None
+    if _http is not None:
+        await _http.aclose()
+        _http = None
 
 
 def _get_client():
@@ -93,12 +112,25 @@ async def create_session(user_id: str | None = None) -> dict:
     return result.data[0]
 
 
+# Everything callers of get_session actually read. Deliberately excludes the
+# messages JSONB blob — it can be many KB and only load_messages needs it.
+_SESSION_COLUMNS = (
+    "id,user_id,stage,state,state_version,sdk_session_id,created_at,updated_at"
+)
+
+
 async def get_session(session_id: str) -> dict | None:
     if _USE_MEMORY:
         return _mem_sessions.get(session_id)
 
     c = _get_client()
-    result = await c.table("sessions").select("*").eq("id", session_id).execute()
+    result = await (
+        c.table("sessions")
+        .select(_SESSION_COLUMNS)
+        .eq("id", session_id)
+        .limit(1)
+        .execute()
+    )
     return result.data[0] if result.data else None
 
 
@@ -112,6 +144,7 @@ async def load_messages(session_id: str) -> list:
         c.table("sessions")
         .select("messages")
         .eq("id", session_id)
+        .limit(1)
         .execute()
     )
     if not result.data:
@@ -119,7 +152,14 @@ async def load_messages(session_id: str) -> list:
     return result.data[0].get("messages") or []
 
 
+def _invalidate_cache(session_id: str) -> None:
+    # Imported lazily — cache.py imports this module at load time
+    from tarini.db import cache
+    cache.invalidate(session_id)
+
+
 async def save_messages(session_id: str, messages: list) -> None:
+    _invalidate_cache(session_id)
     if _USE_MEMORY:
         if session_id in _mem_sessions:
             _mem_sessions[session_id]["messages"] = messages
@@ -134,27 +174,74 @@ async def save_messages(session_id: str, messages: list) -> None:
     )
 
 
-async def update_session_state(session_id: str, new_state: dict) -> dict:
+async def update_sdk_session_id(session_id: str, sdk_session_id: str) -> None:
+    _invalidate_cache(session_id)
+    if _USE_MEMORY:
+        s = _mem_sessions.get(session_id)
+        if s:
+            s["sdk_session_id"] = sdk_session_id
+        return
+
+    c = _get_client()
+    await (
+        c.table("sessions")
+        .update({"sdk_session_id": sdk_session_id})
+        .eq("id", session_id)
+        .execute()
+    )
+
+
+def _deep_merge(base: dict, updates: dict) -> dict:
+    """Spine-copying deep merge — mirrors jsonb_deep_merge in schema.sql.
+
+    Dicts merge recursively; lists and scalars are overwritten. Only dicts
+    along written paths are copied, untouched subtrees are shared.
+    """
+    result = {**base}
+    for key, value in updates.items():
+        existing = result.get(key)
+        if type(existing) is dict and type(value) is dict:
+            result[key] = _deep_merge(existing, value)
+        else:
+            result[key] = value
+    return result
+
+
+async def merge_session_state(session_id: str, updates: dict) -> dict | None:
+    """Deep-merge updates into the session state in one round trip.
+
+    Returns the updated row, or None if the session doesn't exist. On
+    Postgres the merge runs server-side (update_session_state_merged RPC);
+    the memory store merges in-process with the same semantics.
+    """
+    _invalidate_cache(session_id)
     if _USE_MEMORY:
         s = _mem_sessions.get(session_id)
         if not s:
-            raise ValueError(f"Session {session_id} not found")
-        s["state"] = new_state
+            return None
+        current = s.get("state") or {}
+        # Fast paths matching update_state's common shapes: empty state and
+        # flat updates merge in one C-level dict op
+        if not current:
+            s["state"] = dict(updates)
+        elif not any(type(v) is dict for v in updates.values()):
+            s["state"] = {**current, **updates}
+        else:
+            s["state"] = _deep_merge(current, updates)
         s["state_version"] = s.get("state_version", 0) + 1
         s["updated_at"] = datetime.now(timezone.utc).isoformat()
-        return {"state": s["state"], "state_version": s["state_version"]}
+        return s
 
     c = _get_client()
     result = await c.rpc(
-        "update_session_state_atomic",
-        {"p_session_id": session_id, "p_new_state": new_state},
+        "update_session_state_merged",
+        {"p_session_id": session_id, "p_updates": updates},
     ).execute()
-    if not result.data:
-        raise ValueError(f"Session {session_id} not found")
-    return result.data[0]
+    return result.data[0] if result.data else None
 
 
 async def advance_stage(session_id: str, stage: str) -> dict:
+    _invalidate_cache(session_id)
     if _USE_MEMORY:
         s = _mem_sessions.get(session_id)
         if not s:
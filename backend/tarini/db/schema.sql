@@ -46,13 +46,43 @@ CREATE TRIGGER update_sessions_updated_at
   FOR EACH ROW
   EXECUTE FUNCTION update_updated_at_column();
 
--- Atomic state update: replaces state JSONB and increments state_version in ONE statement.
--- Eliminates the read-modify-write race condition that existed when Python did:
---   get_session → compute new_version → update
--- Called via: client.rpc("update_session_state_atomic", {...}).execute()
-CREATE OR REPLACE FUNCTION update_session_state_atomic(
+-- Recursive JSONB deep merge: objects merge key-by-key, everything else
+-- (arrays, scalars) is overwritten by the right-hand side. Mirrors the
+-- Python-side merge used for the in-memory store.
+CREATE OR REPLACE FUNCTION jsonb_deep_merge(a JSONB, b JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+BEGIN
+  IF jsonb_typeof(a) = 'object' AND jsonb_typeof(b) = 'object' THEN
+    RETURN COALESCE(
+      (
+        SELECT jsonb_object_agg(
+                 COALESCE(ka, kb),
+                 CASE
+                   WHEN va IS NULL THEN vb
+                   WHEN vb IS NULL THEN va
+                   ELSE jsonb_deep_merge(va, vb)
+                 END
+               )
+          FROM jsonb_each(a) AS ea(ka, va)
+          FULL JOIN jsonb_each(b) AS eb(kb, vb) ON ka = kb
+      ),
+      '{}'::jsonb
+    );
+  END IF;
+  RETURN b;
+END;
+$$;
+
+-- Atomic merge-and-bump: deep-merges the tool's updates into state and
+-- increments state_version in ONE statement, so the Python side needs no
+-- pre-read and no read-modify-write window exists at all.
+-- Called via: client.rpc("update_session_state_merged", {...}).execute()
+CREATE OR REPLACE FUNCTION update_session_state_merged(
   p_session_id UUID,
-  p_new_state   JSONB
+  p_updates    JSONB
 )
 RETURNS SETOF sessions
 LANGUAGE plpgsql
@@ -60,7 +90,7 @@ AS $$
 BEGIN
   RETURN QUERY
   UPDATE sessions
-     SET state         = p_new_state,
+     SET state         = jsonb_deep_merge(state, p_updates),
          state_version = state_version + 1,
          updated_at    = NOW()
    WHERE id = p_session_id
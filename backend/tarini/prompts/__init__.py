@@ -1,8 +1,14 @@
+from functools import lru_cache
 from pathlib import Path
 
 
+@lru_cache(maxsize=1)
 def load_system_prompt() -> str:
-    """Load Tarini's system prompt from the markdown file."""
+    """Load Tarini's system prompt from the markdown file.
+
+    Cached after the first read — the prompt is static for the process
+    lifetime, so chat turns don't pay a disk read apiece.
+    """
     prompt_file = Path(__file__).parent / "system_prompt.md"
     return prompt_file.read_text(encoding="utf-8")
 
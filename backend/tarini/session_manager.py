@@ -7,7 +7,7 @@ the database so conversations survive server restarts.
 
 Guarantees:
   • One message history list per session (created lazily or loaded from DB).
-  • One asyncio.Lock per session for query serialisation.
+  • Queries are serialised per session via admission control (counter + Condition).
   • History is persisted to Supabase after every turn.
   • Idle sessions are evicted after _IDLE_TTL_SECONDS (default 30 min).
 """
@@ -15,6 +15,7 @@ import asyncio
 import logging
 import time
 from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from typing import AsyncIterator
 
 from tarini.agent import stream_chat
@@ -25,15 +26,36 @@ logger = logging.getLogger(__name__)
 _IDLE_TTL_SECONDS = 30 * 60
 _EVICTION_INTERVAL_SECONDS = 5 * 60
 
+# How many queries may run concurrently for one session. Kept at 1 (strict
+# serialisation) but now an explicit tunable rather than a property of a Lock.
+_MAX_CONCURRENT_QUERIES = 1
+
+# Log a warning when a turn queues this long behind another turn for the same
+# session — the signal to look at turn duration before touching the locking.
+_SLOW_ADMISSION_SECONDS = 1.0
+
+
+@dataclass(slots=True)
+class _SessionEntry:
+    """Everything the manager keeps per session — one dict entry, one lookup."""
+    history: list[dict]
+    last_used: float
+
 
 class SessionManager:
     def __init__(self) -> None:
-        # session_id → list of conversation messages
-        self._histories: dict[str, list[dict]] = {}
-        # Locks to serialise queries (one at a time per session)
-        self._query_locks: dict[str, asyncio.Lock] = {}
-        # Last-used timestamps for idle eviction
-        self._last_used: dict[str, float] = {}
+        # session_id → history + eviction timestamp in a single record, so a
+        # touch or removal is one hash lookup instead of one per field
+        self._sessions: dict[str, _SessionEntry] = {}
+        # Admission control for query serialisation: a single Condition over a
+        # per-session active counter. Unlike a dict of Locks, the counter dict
+        # stays authoritative even if session state is removed mid-stream
+        # (remove_session can't split waiters across two lock objects), and
+        # entries vanish as soon as the count drops to zero. Kept outside
+        # _SessionEntry because counts track in-flight queries, which outlive
+        # remove_session.
+        self._admission = asyncio.Condition()
+        self._active: dict[str, int] = {}
         # Background eviction task
         self._eviction_task: asyncio.Task | None = None
 
@@ -42,6 +64,15 @@ class SessionManager:
     # ------------------------------------------------------------------
 
     def start_eviction_task(self) -> None:
+        """Start the idle-eviction loop if it isn't already running.
+
+        Called lazily from chat() on the first active session rather than at
+        server startup — an instance that never serves a chat never wakes up
+        to sweep an empty dict, and the loop retires itself once the last
+        session is evicted.
+        """
+        if self._eviction_task is not None and not self._eviction_task.done():
+            return
         self._eviction_task = asyncio.create_task(self._evict_idle_sessions())
         logger.info(
             "Session eviction task started (TTL=%ds, interval=%ds)",
@@ -50,10 +81,27 @@ class SessionManager:
 
     @asynccontextmanager
     async def query_lock(self, session_id: str) -> AsyncIterator[None]:
-        """Acquire the per-session lock for query serialisation."""
-        lock = self._query_locks.setdefault(session_id, asyncio.Lock())
-        async with lock:
+        """Admit a query for the session, serialising up to the concurrency cap."""
+        wait_start = time.monotonic()
+        async with self._admission:
+            while self._active.get(session_id, 0) >= _MAX_CONCURRENT_QUERIES:
+                await self._admission.wait()
+            self._active[session_id] = self._active.get(session_id, 0) + 1
+        waited = time.monotonic() - wait_start
+        if waited >= _SLOW_ADMISSION_SECONDS:
+            logger.warning(
+                "Query for session %s waited %.2fs for admission", session_id, waited,
+            )
+        try:
             yield
+        finally:
+            async with self._admission:
+                remaining = self._active.get(session_id, 1) - 1
+                if remaining <= 0:
+                    self._active.pop(session_id, None)
+                else:
+                    self._active[session_id] = remaining
+                self._admission.notify_all()
 
     async def chat(
         self, session_id: str, user_message: str,
@@ -67,36 +115,55 @@ class SessionManager:
         After the turn completes the updated history is persisted back.
         """
         # Load from DB on cache miss
-        if session_id not in self._histories:
+        entry = self._sessions.get(session_id)
+        if entry is None:
             logger.info("Cache miss for session %s — loading history from DB", session_id)
-            self._histories[session_id] = await db.load_messages(session_id)
-
-        history = self._histories[session_id]
-        self._last_used[session_id] = time.monotonic()
-
-        async for event in stream_chat(session_id, user_message, history):
-            # Persist BEFORE yielding "done" — the SSE generator cancels our
-            # task immediately after receiving "done", so post-yield code
-            # would never execute.
-            if event.get("type") == "done":
-                self._last_used[session_id] = time.monotonic()
-                try:
-                    await db.save_messages(session_id, history)
-                    logger.info(
-                        "Persisted %d messages for session %s",
-                        len(history), session_id,
-                    )
-                except Exception:
-                    logger.exception(
-                        "Failed to persist messages for session %s", session_id,
-                    )
-            yield event
+            entry = _SessionEntry(
+                history=await db.load_messages(session_id),
+                last_used=0.0,
+            )
+            self._sessions[session_id] = entry
+
+        history = entry.history
+        entry.last_used = time.monotonic()
+        self.start_eviction_task()
+
+        try:
+            async for event in stream_chat(session_id, user_message, history):
+                # Persist BEFORE yielding "done" — the SSE generator cancels
+                # our task immediately after receiving "done", so post-yield
+                # code would never execute.
+                if event.get("type") == "done":
+                    entry.last_used = time.monotonic()
+                    try:
+                        await db.save_messages(session_id, history)
+                        logger.info(
+                            "Persisted %d messages for session %s",
+                            len(history), session_id,
+                        )
+                    except Exception:
+                        logger.exception(
+                            "Failed to persist messages for session %s", session_id,
+                        )
+                yield event
+        except asyncio.CancelledError:
+            # Client disconnected mid-stream. The cancellation unwinds
+            # stream_chat's `async with client.messages.stream(...)`, which
+            # closes the upstream HTTP stream — no tokens keep billing for an
+            # abandoned request. Re-raise so the lock and drain clean up.
+            logger.info(
+                "Chat cancelled for session %s — upstream stream aborted",
+                session_id,
+            )
+            raise
 
     def remove_session(self, session_id: str) -> None:
-        """Remove all state for a session."""
-        self._histories.pop(session_id, None)
-        self._query_locks.pop(session_id, None)
-        self._last_used.pop(session_id, None)
+        """Remove all state for a session.
+
+        The admission counter is deliberately left alone — it tracks in-flight
+        queries, which clean up after themselves when they exit query_lock.
+        """
+        self._sessions.pop(session_id, None)
         logger.info("Removed session %s", session_id)
 
     async def cleanup(self) -> None:
@@ -109,9 +176,7 @@ class SessionManager:
                 pass
             self._eviction_task = None
 
-        self._histories.clear()
-        self._query_locks.clear()
-        self._last_used.clear()
+        self._sessions.clear()
 
     # ------------------------------------------------------------------
     # Private
@@ -122,12 +187,18 @@ class SessionManager:
             await asyncio.sleep(_EVICTION_INTERVAL_SECONDS)
             now = time.monotonic()
             idle = [
-                sid for sid, last in list(self._last_used.items())
-                if (now - last) >= _IDLE_TTL_SECONDS
+                sid for sid, entry in list(self._sessions.items())
+                if (now - entry.last_used) >= _IDLE_TTL_SECONDS
             ]
             for session_id in idle:
                 logger.info("Evicting idle session %s", session_id)
                 self.remove_session(session_id)
+            if not self._sessions:
+                # Nothing left to watch — retire until the next chat turn
+                # restarts the loop.
+                logger.info("No active sessions — eviction task stopping")
+                self._eviction_task = None
+                return
 
 
 # Module-level singleton
@@ -4,6 +4,8 @@ Tarini tool definitions for Anthropic API tool use.
 TOOL_DEFINITIONS: list of dicts in Anthropic tool-use format.
 execute_tool(session_id, tool_name, tool_input): dispatches to the right handler.
 """
+import orjson
+
 from .state import get_state, update_state, advance_stage
 from .ui import validate_emit_ui, emit_ui_result
 
@@ -105,21 +107,61 @@ TOOL_DEFINITIONS = [
     },
 ]
 
+# Frozen so nothing can mutate the schemas at runtime; the SDK accepts any
+# iterable of tool params.
+TOOL_DEFINITIONS = tuple(TOOL_DEFINITIONS)
+
+
+# ---------------------------------------------------------------------------
+# Dispatch — adapters share a (session_id, tool_input) signature so execute_tool
+# is a single dict lookup rather than a string-compare chain
+# ---------------------------------------------------------------------------
+
+# Shared sentinel so missing args don't allocate a fresh empty dict per call.
+# Never mutated — update_state rejects empty updates before touching them.
+_EMPTY: dict = {}
+
+
+async def _run_get_state(session_id: str, tool_input: dict) -> dict:
+    return await get_state(session_id)
+
+
+async def _run_update_state(session_id: str, tool_input: dict) -> dict:
+    return await update_state(session_id, tool_input.get("updates") or _EMPTY)
+
+
+async def _run_advance_stage(session_id: str, tool_input: dict) -> dict:
+    return await advance_stage(session_id, tool_input.get("stage") or "")
+
+
+async def _run_emit_ui(session_id: str, tool_input: dict) -> dict:
+    component = tool_input.get("component", "")
+    props = tool_input.get("props", {})
+    error = validate_emit_ui(component, props)
+    return {"error": error} if error else emit_ui_result(component)
+
+
+_TOOL_HANDLERS = {
+    "get_state": _run_get_state,
+    "update_state": _run_update_state,
+    "advance_stage": _run_advance_stage,
+    "emit_ui": _run_emit_ui,
+}
+
+
+async def execute_tool(
+    session_id: str, tool_name: str, tool_input: dict,
+) -> tuple[str, dict]:
+    """Dispatch a tool call and return (result_str, result_data).
 
-async def execute_tool(session_id: str, tool_name: str, tool_input: dict) -> str:
-    """Dispatch a tool call and return the result as a JSON string."""
-    if tool_name == "get_state":
-        return await get_state(session_id)
-    elif tool_name == "update_state":
-        return await update_state(session_id, tool_input.get("updates", {}))
-    elif tool_name == "advance_stage":
-        return await advance_stage(session_id, tool_input.get("stage", ""))
-    elif tool_name == "emit_ui":
-        component = tool_input.get("component", "")
-        props = tool_input.get("props", {})
-        error = validate_emit_ui(component, props)
-        if error:
-            return f'{{"error": "{error}"}}'
-        return emit_ui_result(component)
+    result_str is the JSON sent back to Claude as tool_result content;
+    result_data is the same payload as a dict, so callers read structured
+    fields without re-parsing the string they just serialised.
+    """
+    handler = _TOOL_HANDLERS.get(tool_name)
+    if handler is None:
+        data = {"error": f"Unknown tool: {tool_name}"}
     else:
-        return f'{{"error": "Unknown tool: {tool_name}"}}'
+        data = await handler(session_id, tool_input)
+    # orjson emits UTF-8 directly, matching the old ensure_ascii=False output
+    return orjson.dumps(data).decode(), data
@@ -1,95 +1,73 @@
 """
-Tarini's 3 state tools — pure async functions returning JSON strings.
+Tarini's 3 state tools — pure async functions returning result dicts.
 
-These are called by the tool dispatcher in __init__.py.
+These are called by the tool dispatcher in __init__.py, which serialises the
+dict once for Claude and passes it through unparsed for the event stream.
 """
-import json
-from copy import deepcopy
-
+from tarini.db import cache as db_cache
 from tarini.db import client as db
 
 
-# ---------------------------------------------------------------------------
-# Deep merge utility
-# ---------------------------------------------------------------------------
-
-def _deep_merge(base: dict, updates: dict) -> dict:
-    """
-    Recursively merge `updates` into `base`.
-    - Dicts are merged recursively.
-    - All other types are overwritten.
-    - Lists are overwritten (not appended), allowing replacements.
-    """
-    result = deepcopy(base)
-    for key, value in updates.items():
-        if (
-            key in result
-            and isinstance(result[key], dict)
-            and isinstance(value, dict)
-        ):
-            result[key] = _deep_merge(result[key], value)
-        else:
-            result[key] = value
-    return result
-
-
-VALID_STAGES = ("intro", "structure", "packages", "mapping", "verification")
+VALID_STAGES = frozenset({"intro", "structure", "packages", "mapping", "verification"})
+# Onboarding order, pre-joined for the invalid-stage error message
+_VALID_STAGES_STR = "intro, structure, packages, mapping, verification"
 
 
 # ---------------------------------------------------------------------------
 # Tool implementations
 # ---------------------------------------------------------------------------
 
-async def get_state(session_id: str) -> str:
-    """Return session state as JSON string."""
-    session = await db.get_session(session_id)
+async def get_state(session_id: str) -> dict:
+    """Return session stage/state as a result dict."""
+    session = await db_cache.get_session_cached(session_id)
     if not session:
-        return json.dumps({"error": "Session not found"})
-    return json.dumps(
-        {
-            "stage": session.get("stage", "intro"),
-            "state": session.get("state") or {},
-            "state_version": session.get("state_version", 1),
-        },
-        ensure_ascii=False,
-    )
+        return {"error": "Session not found"}
+    return {
+        "stage": session.get("stage", "intro"),
+        "state": session.get("state") or {},
+        "state_version": session.get("state_version", 1),
+    }
 
 
-async def update_state(session_id: str, updates: dict) -> str:
-    """Deep-merge updates into session state. Return result as JSON string."""
+async def update_state(session_id: str, updates: dict) -> dict:
+    """Deep-merge updates into session state. Return the result dict."""
     if not updates:
-        return json.dumps({"error": "No updates provided"})
-
-    session = await db.get_session(session_id)
-    if not session:
-        return json.dumps({"error": "Session not found"})
-
-    current_state = session.get("state") or {}
-    new_state = _deep_merge(current_state, updates)
-    updated = await db.update_session_state(session_id, new_state)
-
-    return json.dumps(
-        {
-            "saved": True,
-            "state_version": updated.get("state_version"),
-            "state": updated.get("state") or new_state,
-        },
-        ensure_ascii=False,
-    )
-
-
-async def advance_stage(session_id: str, stage: str) -> str:
-    """Advance the session to a new stage. Return result as JSON string."""
-    stage = (stage or "").strip()
+        return {"error": "No updates provided"}
+
+    # Single round trip: the merge happens in the db layer (server-side on
+    # Postgres, in-process for the memory store), so no pre-read is needed.
+    updated = await db.merge_session_state(session_id, updates)
+    if updated is None:
+        return {"error": "Session not found"}
+
+    return {
+        "saved": True,
+        "state_version": updated.get("state_version"),
+        "state": updated.get("state") or {},
+        # The merged row carries stage — the caller builds a state_snapshot
+        # without a re-fetch.
+        "stage": updated.get("stage", "intro"),
+    }
+
+
+async def advance_stage(session_id: str, stage: str) -> dict:
+    """Advance the session to a new stage. Return the result dict."""
+    if stage:
+        stage = stage.strip()
     if stage not in VALID_STAGES:
-        return json.dumps(
-            {
-                "error": (
-                    f"Invalid stage: '{stage}'. "
-                    f"Must be one of: {', '.join(VALID_STAGES)}"
-                )
-            }
-        )
+        return {
+            "error": (
+                f"Invalid stage: '{stage}'. "
+                f"Must be one of: {_VALID_STAGES_STR}"
+            )
+        }
 
     updated = await db.advance_stage(session_id, stage)
-    return json.dumps({"stage": updated.get("stage"), "advanced": True})
+    return {
+        "stage": updated.get("stage"),
+        "advanced": True,
+        # The update returns the full row — pass state through so the
+        # caller can build a state_snapshot without a re-fetch.
+        "state": updated.get("state") or {},
+        "state_version": updated.get("state_version", 0),
+    }
@@ -5,11 +5,9 @@ This is a side-channel tool: it doesn't mutate state, it tells the frontend
 to render a component in the chat. The tool result returned to Claude confirms
 the component was emitted, so Claude knows it was shown to the user.
 """
-import json
-
 
 # Components that Claude can request via emit_ui
-AVAILABLE_COMPONENTS = {
+AVAILABLE_COMPONENTS = frozenset({
     "WelcomeHero",
     "PropertyTypeSelector",
     "IntroSummaryCard",
@@ -30,7 +28,10 @@ AVAILABLE_COMPONENTS = {
     "VerificationSummary",
     "PendingItemsList",
     "CompletionCelebration",
-}
+})
+
+# Pre-sorted for the unknown-component error message
+_AVAILABLE_COMPONENTS_STR = ", ".join(sorted(AVAILABLE_COMPONENTS))
 
 
 def validate_emit_ui(component: str, props: dict) -> str | None:
@@ -40,16 +41,16 @@ def validate_emit_ui(component: str, props: dict) -> str | None:
     if component not in AVAILABLE_COMPONENTS:
         return (
             f"Unknown component: '{component}'. "
-            f"Available: {', '.join(sorted(AVAILABLE_COMPONENTS))}"
+            f"Available: {_AVAILABLE_COMPONENTS_STR}"
         )
     if not isinstance(props, dict):
         return "'props' must be a JSON object."
     return None
 
 
-def emit_ui_result(component: str) -> str:
-    """Return the tool result string confirming the component was rendered."""
-    return json.dumps({
+def emit_ui_result(component: str) -> dict:
+    """Return the tool result dict confirming the component was rendered."""
+    return {
         "rendered": True,
         "component": component,
-    })
+    }